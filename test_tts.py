@@ -1,29 +1,161 @@
 import os
-import requests
-import boto3
-from dotenv import load_dotenv
+import re
+import time
+import base64
+import asyncio
+import contextlib
 import json
-from datetime import datetime
-from botocore.exceptions import ClientError
+import pytest
+from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-def test_aws_credentials():
-    """Test if AWS credentials are valid using STS"""
+HAS_ELEVENLABS_KEY = bool(os.getenv('REACT_APP_ELEVENLABS_API_KEY'))
+HAS_AWS_KEYS = bool(os.getenv('AWS_ACCESS_KEY_ID') and os.getenv('AWS_SECRET_ACCESS_KEY'))
+
+# Skip the whole module before importing any networking libraries when there is nothing to test with
+if not HAS_ELEVENLABS_KEY and not HAS_AWS_KEYS:
+    pytest.skip("neither ElevenLabs nor AWS credentials are set", allow_module_level=True)
+
+import httpx
+import orjson
+import websockets
+from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+
+# Shared HTTP client so every request reuses the same keep-alive connection pool,
+# sized so concurrent tests don't queue on connection acquisition
+HTTP_CLIENT = httpx.AsyncClient(
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+)
+
+# ElevenLabs synthesis settings shared by the REST and WebSocket tests
+ELEVENLABS_MODEL_ID = "eleven_turbo_v2_5"
+ELEVENLABS_VOICE_SETTINGS = {
+    "stability": 0.5,
+    "similarity_boost": 0.75
+}
+
+# Upper bound on a WebSocket streaming session, so a stalled stream fails instead of hanging the run
+ELEVENLABS_WS_TIMEOUT = 30
+
+# Successful STS identities keyed by (access key, region), reused for STS_CACHE_TTL seconds
+STS_CACHE_TTL = 300
+_sts_cache = {}
+_sts_cache_lock = asyncio.Lock()
+
+# Expected shapes of long-term AWS access key IDs and secret access keys
+_AK_RE = re.compile(r'AKIA[A-Z0-9]{16}')
+_SK_RE = re.compile(r'[A-Za-z0-9/+=]{40}')
+
+# Shared aiobotocore session (and its service model loader), created on first use
+_aws_session = None
+
+# Open AWS clients keyed by service name, kept alive for the whole run by one exit stack
+_aws_clients = {}
+_aws_clients_lock = asyncio.Lock()
+_aws_exit_stack = contextlib.AsyncExitStack()
+
+async def get_aws_client(service):
+    """Return a shared async AWS client using the credentials from the environment"""
+    global _aws_session
+    async with _aws_clients_lock:
+        if service not in _aws_clients:
+            if _aws_session is None:
+                # Imported here so ElevenLabs-only runs skip botocore's import and data loading
+                from aiobotocore.session import get_session
+                _aws_session = get_session()
+            
+            _aws_clients[service] = await _aws_exit_stack.enter_async_context(
+                _aws_session.create_client(
+                    service,
+                    aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+                    aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+                    region_name=os.getenv('AWS_REGION', 'us-east-1')
+                )
+            )
+        return _aws_clients[service]
+
+# SigV4 signer for direct Polly requests, created on first use
+_polly_signer = None
+
+def sign_polly_request(url, body):
+    """Return SigV4-signed headers for a Polly REST request"""
+    global _polly_signer
+    # Imported here so ElevenLabs-only runs skip botocore's import and data loading
+    from botocore.auth import SigV4Auth
+    from botocore.awsrequest import AWSRequest
+    
+    if _polly_signer is None:
+        from botocore.credentials import Credentials
+        credentials = Credentials(os.getenv('AWS_ACCESS_KEY_ID'), os.getenv('AWS_SECRET_ACCESS_KEY'))
+        _polly_signer = SigV4Auth(credentials, 'polly', os.getenv('AWS_REGION', 'us-east-1'))
+    
+    request = AWSRequest(method='POST', url=url, data=body, headers={'Content-Type': 'application/json'})
+    _polly_signer.add_auth(request)
+    return dict(request.headers)
+
+async def close_aws_clients():
+    """Close every shared AWS client opened during the run"""
+    _aws_clients.clear()
+    await _aws_exit_stack.aclose()
+
+class TTSRequestError(Exception):
+    """Error response returned by a TTS REST API"""
+    
+    def __init__(self, status, error_type, message):
+        super().__init__(f"{error_type or status}: {message}")
+        self.status = status
+        self.error_type = error_type
+        self.message = message
+
+class RateLimitError(TTSRequestError):
+    """TTS request rejected because of rate limiting or throttling"""
+
+@retry(
+    wait=wait_exponential(multiplier=1, min=1, max=30),
+    stop=stop_after_attempt(3),
+    retry=retry_if_exception_type(RateLimitError),
+    reraise=True
+)
+async def stream_audio_to_file(url, headers, body, filename, chunk_size):
+    """POST a TTS request and write the audio to disk as it arrives, returning the time to first byte"""
+    start = time.perf_counter()
+    async with HTTP_CLIENT.stream("POST", url, headers=headers, content=body) as response:
+        if response.status_code != 200:
+            await response.aread()
+            error_type = response.headers.get('x-amzn-ErrorType', '').split(':')[0]
+            rate_limited = response.status_code == 429 or error_type == 'ThrottlingException'
+            error_class = RateLimitError if rate_limited else TTSRequestError
+            raise error_class(response.status_code, error_type, response.text)
+        
+        ttfb = None
+        with open(filename, "wb") as f:
+            async for chunk in response.aiter_bytes(chunk_size):
+                if ttfb is None:
+                    ttfb = time.perf_counter() - start
+                f.write(chunk)
+    return ttfb
+
+async def check_aws_credentials():
+    """Check if AWS credentials are valid using STS"""
     print("\nTesting AWS credentials with STS...")
     
+    from botocore.exceptions import ClientError
+    
+    cache_key = (os.getenv('AWS_ACCESS_KEY_ID'), os.getenv('AWS_REGION', 'us-east-1'))
+    
     try:
-        # Create STS client
-        sts = boto3.client(
-            'sts',
-            aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-            aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-            region_name=os.getenv('AWS_REGION', 'us-east-1')
-        )
-        
-        # Try to get caller identity
-        response = sts.get_caller_identity()
+        # Try to get caller identity, skipping the STS round-trip if it was resolved recently.
+        # The lock lets concurrent callers wait for one lookup instead of each making their own.
+        async with _sts_cache_lock:
+            cached = _sts_cache.get(cache_key)
+            if cached and cached['expires'] > time.monotonic():
+                response = cached['identity']
+            else:
+                sts = await get_aws_client('sts')
+                response = await sts.get_caller_identity()
+                _sts_cache[cache_key] = {'expires': time.monotonic() + STS_CACHE_TTL, 'identity': response}
         print(f"✅ AWS credentials are valid!")
         print(f"   Account: {response['Account']}")
         print(f"   User ARN: {response['Arn']}")
@@ -51,7 +183,7 @@ def test_aws_credentials():
         print(f"❌ Unexpected error testing AWS credentials: {str(e)}")
         return False
 
-def validate_aws_credentials():
+async def validate_aws_credentials():
     """Validate AWS credentials format"""
     print("\nValidating AWS credentials...")
     
@@ -67,11 +199,11 @@ def validate_aws_credentials():
         return False
         
     # Check credential format
-    if len(aws_access_key) != 20:
-        print(f"❌ AWS_ACCESS_KEY_ID appears invalid (length: {len(aws_access_key)})")
+    if not _AK_RE.fullmatch(aws_access_key):
+        print(f"❌ AWS_ACCESS_KEY_ID appears invalid (should be AKIA + 16 uppercase letters/digits, length: {len(aws_access_key)})")
         return False
-    if len(aws_secret_key) != 40:
-        print(f"❌ AWS_SECRET_ACCESS_KEY appears invalid (length: {len(aws_secret_key)})")
+    if not _SK_RE.fullmatch(aws_secret_key):
+        print(f"❌ AWS_SECRET_ACCESS_KEY appears invalid (should be 40 base64 characters, length: {len(aws_secret_key)})")
         return False
         
     print(f"✅ AWS credentials found:")
@@ -80,10 +212,10 @@ def validate_aws_credentials():
     print(f"   Region: {aws_region}")
     
     # Test if credentials are valid
-    return test_aws_credentials()
+    return await check_aws_credentials()
 
-def test_elevenlabs():
-    """Test ElevenLabs TTS API"""
+async def check_elevenlabs():
+    """Check ElevenLabs TTS API"""
     print("\n=== Testing ElevenLabs ===")
     
     # Get API key from environment
@@ -107,65 +239,134 @@ def test_elevenlabs():
         }
         data = {
             "text": test_text,
-            "model_id": "eleven_monolingual_v1",
-            "voice_settings": {
-                "stability": 0.5,
-                "similarity_boost": 0.75
-            }
+            "model_id": ELEVENLABS_MODEL_ID,
+            "voice_settings": ELEVENLABS_VOICE_SETTINGS
         }
         
         print("Making request to ElevenLabs API...")
-        response = requests.post(url, headers=headers, json=data)
-        
-        if response.status_code == 200:
-            # Save the audio file
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"elevenlabs_test_{timestamp}.mp3"
-            with open(filename, "wb") as f:
-                f.write(response.content)
-            print(f"✅ Success! Audio saved as {filename}")
-            return True
-        else:
-            print(f"❌ Error: {response.status_code}")
-            print(f"Response: {response.text}")
+        body = orjson.dumps(data)
+        timestamp = time.strftime("%Y%m%d_%H%M%S", time.localtime())
+        filename = f"elevenlabs_test_{timestamp}.mp3"
+        try:
+            # Write audio chunks to disk as they arrive instead of buffering the whole body
+            ttfb = await stream_audio_to_file(url, headers, body, filename, 4096)
+        except TTSRequestError as e:
+            print(f"❌ Error: {e.status}")
+            print(f"Response: {e.message}")
             return False
+        
+        if ttfb is not None:
+            print(f"   Time to first byte: {ttfb * 1000:.0f}ms")
+        print(f"✅ Success! Audio saved as {filename}")
+        return True
             
     except Exception as e:
         print(f"❌ Error testing ElevenLabs: {str(e)}")
         return False
 
-def test_aws_polly():
-    """Test AWS Polly TTS service"""
-    print("\n=== Testing AWS Polly ===")
+async def check_elevenlabs_websocket():
+    """Check ElevenLabs TTS with sentence-by-sentence WebSocket input streaming"""
+    print("\n=== Testing ElevenLabs WebSocket Streaming ===")
     
-    # Validate credentials first
-    if not validate_aws_credentials():
+    # Get API key from environment
+    api_key = os.getenv('REACT_APP_ELEVENLABS_API_KEY')
+    voice_id = os.getenv('REACT_APP_ELEVENLABS_VOICE_ID', 'EXAVITQu4vr4xnSDxMaL')
+    
+    if not api_key:
+        print("❌ ElevenLabs API key not found in environment variables")
         return False
     
+    # Test text, sent one sentence at a time the way a streaming LLM response would arrive
+    test_sentences = [
+        "Hello!",
+        "This is a test of the ElevenLabs WebSocket streaming API.",
+        "Each sentence is sent as soon as it is ready."
+    ]
+    
     try:
-        # Initialize Polly client with explicit credentials
-        polly = boto3.client(
-            'polly',
-            aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-            aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-            region_name=os.getenv('AWS_REGION', 'us-east-1')
+        uri = (
+            f"wss://api.elevenlabs.io/v1/text-to-speech/{voice_id}/stream-input"
+            f"?model_id={ELEVENLABS_MODEL_ID}&output_format=mp3_44100_128"
         )
+        timestamp = time.strftime("%Y%m%d_%H%M%S", time.localtime())
+        filename = f"elevenlabs_ws_test_{timestamp}.mp3"
+        
+        print("Connecting to ElevenLabs WebSocket API...")
+        start = time.perf_counter()
+        async with websockets.connect(uri) as ws:
+            async def send_text():
+                # The first message opens the stream, an empty text message closes it
+                await ws.send(orjson.dumps({
+                    "text": " ",
+                    "voice_settings": ELEVENLABS_VOICE_SETTINGS,
+                    "xi_api_key": api_key
+                }).decode())
+                for sentence in test_sentences:
+                    await ws.send(orjson.dumps({"text": sentence + " "}).decode())
+                await ws.send(orjson.dumps({"text": ""}).decode())
+            
+            async def receive_audio():
+                # Write audio chunks to disk while later sentences are still being sent
+                ttfb = None
+                with open(filename, "wb") as f:
+                    async for message in ws:
+                        data = orjson.loads(message)
+                        if data.get("error"):
+                            raise RuntimeError(data.get("message") or data["error"])
+                        if data.get("audio"):
+                            if ttfb is None:
+                                ttfb = time.perf_counter() - start
+                            f.write(base64.b64decode(data["audio"]))
+                        if data.get("isFinal"):
+                            break
+                return ttfb
+            
+            _, ttfb = await asyncio.wait_for(
+                asyncio.gather(send_text(), receive_audio()),
+                timeout=ELEVENLABS_WS_TIMEOUT
+            )
+        
+        if ttfb is None:
+            print("❌ Error: no audio received from ElevenLabs WebSocket")
+            return False
         
+        print(f"   Time to first byte: {ttfb * 1000:.0f}ms")
+        print(f"✅ Success! Audio saved as {filename}")
+        return True
+        
+    except asyncio.TimeoutError:
+        print(f"❌ Error testing ElevenLabs WebSocket: no final message within {ELEVENLABS_WS_TIMEOUT}s")
+        return False
+    except Exception as e:
+        print(f"❌ Error testing ElevenLabs WebSocket: {str(e)}")
+        return False
+
+async def check_aws_polly():
+    """Check AWS Polly TTS service"""
+    print("\n=== Testing AWS Polly ===")
+    
+    # Validate credentials first
+    if not await validate_aws_credentials():
+        return False
+    
+    try:
         # Test text
         test_text = "Hello! This is a test of the AWS Polly text to speech service."
         
         print("Making request to AWS Polly...")
-        response = polly.synthesize_speech(
-            Text=test_text,
-            OutputFormat='mp3',
-            VoiceId='Joanna'  # Using Joanna as a default voice
-        )
+        # Sign the fixed SynthesizeSpeech call ourselves and send it over the shared HTTP client
+        url = f"https://polly.{os.getenv('AWS_REGION', 'us-east-1')}.amazonaws.com/v1/speech"
+        body = orjson.dumps({
+            "Text": test_text,
+            "OutputFormat": "mp3",
+            "VoiceId": "Joanna"  # Using Joanna as a default voice
+        })
+        headers = sign_polly_request(url, body)
         
-        # Save the audio file
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # Save the audio file, copying it to disk in chunks rather than buffering it all in memory
+        timestamp = time.strftime("%Y%m%d_%H%M%S", time.localtime())
         filename = f"aws_polly_test_{timestamp}.mp3"
-        with open(filename, "wb") as f:
-            f.write(response['AudioStream'].read())
+        await stream_audio_to_file(url, headers, body, filename, 65536)
         print(f"✅ Success! Audio saved as {filename}")
         return True
         
@@ -179,19 +380,32 @@ def test_aws_polly():
             print("4. Verify the AWS region is correct")
         return False
 
-def main():
-    print("Starting TTS Service Tests...")
-    
-    # Test ElevenLabs
-    elevenlabs_success = test_elevenlabs()
-    
-    # Test AWS Polly
-    aws_success = test_aws_polly()
-    
-    # Print summary
-    print("\n=== Test Summary ===")
-    print(f"ElevenLabs: {'✅ Success' if elevenlabs_success else '❌ Failed'}")
-    print(f"AWS Polly: {'✅ Success' if aws_success else '❌ Failed'}")
+# All tests in this module run concurrently in one event loop
+pytestmark = pytest.mark.asyncio_concurrent(group="tts")
+
+@pytest.fixture(scope="module", autouse=True)
+def shared_clients():
+    """Close the shared clients once every test in this module has run"""
+    yield
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(HTTP_CLIENT.aclose())
+    loop.run_until_complete(close_aws_clients())
+
+requires_elevenlabs = pytest.mark.skipif(not HAS_ELEVENLABS_KEY, reason="REACT_APP_ELEVENLABS_API_KEY not set")
+requires_aws = pytest.mark.skipif(not HAS_AWS_KEYS, reason="AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY not set")
+
+@requires_aws
+async def test_aws_credentials():
+    assert await check_aws_credentials()
+
+@requires_elevenlabs
+async def test_elevenlabs():
+    assert await check_elevenlabs()
+
+@requires_elevenlabs
+async def test_elevenlabs_websocket():
+    assert await check_elevenlabs_websocket()
 
-if __name__ == "__main__":
-    main() 
\ No newline at end of file
+@requires_aws
+async def test_aws_polly():
+    assert await check_aws_polly()